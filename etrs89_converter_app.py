@@ -1,8 +1,38 @@
+import io
 
 import pandas as pd
 import streamlit as st
+from pyproj.network import set_network_enabled
+
+from etrs89_converter.converter import convert_dataframe, warm_transformers
+from etrs89_converter.reader import read_upload
+
+# Sin descargas de rejillas desde cdn.proj.org: en España el cambio
+# ETRS89↔WGS84 no las necesita y evita esperas de red al convertir
+set_network_enabled(active=False)
+
+# Filas convertidas por bloque al pulsar «Convertir»
+_CHUNK_ROWS = 200_000
+
+# Archivos leídos que se conservan en memoria (compartidos entre sesiones)
+_LOAD_CACHE_ENTRIES = 8
+_LOAD_CACHE_TTL = "30m"
+
+
+@st.cache_resource
+def _warm_transformers(input_epsg: str) -> None:
+    # Crea los Transformer de los husos 29–31N una sola vez por proceso,
+    # fuera del botón «Convertir» (la caché del conversor los conserva)
+    warm_transformers(input_epsg)
+
+
+@st.cache_data(max_entries=_LOAD_CACHE_ENTRIES, ttl=_LOAD_CACHE_TTL)
+def _load_file(data: bytes, is_csv: bool, sep: str | None, enc: str | None) -> pd.DataFrame:
+    # Streamlit reejecuta el script con cada widget; la caché (por contenido
+    # y opciones de lectura) evita volver a parsear el archivo cada vez. Se
+    # limita en número y tiempo para no retener todos los archivos subidos
+    return read_upload(data, is_csv, sep, enc)
 
-from etrs89_converter.converter import convert_dataframe
 
 st.set_page_config(page_title="Conversor Lat/Lon → ETRS89 / UTM", layout="centered")
 
@@ -27,6 +57,8 @@ uploaded = st.file_uploader("Sube un archivo CSV o Excel", type=["csv", "xlsx",
 
 # Opciones de lectura CSV
 is_csv = False
+sep = None
+enc = None
 sep_map = {
     "Auto (detectar automáticamente)": None,
     "Coma (,)": ",",
@@ -48,13 +80,7 @@ if uploaded is not None:
 
     # Leer archivo
     try:
-        if is_csv:
-            if sep is None:
-                df = pd.read_csv(uploaded, sep=None, engine="python", encoding=enc)
-            else:
-                df = pd.read_csv(uploaded, sep=sep, encoding=enc)
-        else:
-            df = pd.read_excel(uploaded)  # requiere openpyxl
+        df = _load_file(uploaded.getvalue(), is_csv, sep, enc)
     except Exception as e:
         st.error(f"Error leyendo el archivo: {e}")
         st.stop()
@@ -87,6 +113,7 @@ if uploaded is not None:
         index=0
     )
     input_epsg = "EPSG:4258" if "4258" in assume_input else "EPSG:4326"
+    _warm_transformers(input_epsg)
 
     st.markdown("---")
     st.subheader("Salida")
@@ -105,20 +132,41 @@ if uploaded is not None:
 
 
     if st.button("Convertir"):
+        # Se convierte por bloques de filas para acotar la memoria intermedia
+        # (copias, arrays proyectados, texto CSV) en archivos grandes
+        buf = io.BytesIO()
+        preview = None
+        n_valid = n_drop = 0
+        transform_error = None
         try:
-            out, n_valid, n_drop = convert_dataframe(
-                df,
-                lat_col,
-                lon_col,
-                mode=(
-                    "force_31n"
-                    if "Forzar" in mode_choice
-                    else "auto" if "Auto" in mode_choice else "fixed"
-                ),
-                fixed_zone=fixed_zone,
-                use_decimal_comma=use_decimal_comma,
-                input_epsg=input_epsg,
-            )
+            for start in range(0, len(df), _CHUNK_ROWS):
+                out, chunk_valid, chunk_drop = convert_dataframe(
+                    df.iloc[start:start + _CHUNK_ROWS],
+                    lat_col,
+                    lon_col,
+                    mode=(
+                        "force_31n"
+                        if "Forzar" in mode_choice
+                        else "auto" if "Auto" in mode_choice else "fixed"
+                    ),
+                    fixed_zone=fixed_zone,
+                    use_decimal_comma=use_decimal_comma,
+                    input_epsg=input_epsg,
+                    allow_empty=True,
+                )
+                # Todos los bloques pasan por to_csv: mismo formato en todo el archivo
+                out.to_csv(buf, index=False, header=start == 0, encoding="utf-8")
+                if preview is None or preview.empty:
+                    preview = out.head()
+                n_valid += chunk_valid
+                n_drop += chunk_drop
+                transform_error = out.attrs.get("transform_error", transform_error)
+            if n_valid == 0:
+                if transform_error is not None:
+                    raise ValueError(
+                        f"Coordinate transformation failed for all rows: {transform_error}"
+                    )
+                raise ValueError("No valid rows with latitudes/longitudes in range.")
         except ValueError as e:
             st.error(str(e))
             st.stop()
@@ -126,12 +174,11 @@ if uploaded is not None:
         st.success(
             f"Conversión completada. {n_valid} filas válidas; {n_drop} descartadas por lat/lon inválidas."
         )
-        st.write(out.head())
+        st.write(preview)
 
-        csv_bytes = out.to_csv(index=False).encode("utf-8")
         st.download_button(
             "Descargar CSV convertido",
-            data=csv_bytes,
+            data=buf,  # Streamlit lee el buffer sin una copia previa nuestra
             file_name="convertido_ETRS89_UTM.csv",
             mime="text/csv",
         )
@@ -1,3 +1,4 @@
 """ETRS89 converter package."""
 
-from .converter import convert_dataframe
+from .converter import convert_dataframe, warm_transformers
+from .reader import read_upload
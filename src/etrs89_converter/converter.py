@@ -1,14 +1,194 @@
+import cmath
+import math
+from collections import OrderedDict
+
 import numpy as np
 import pandas as pd
-from functools import lru_cache
 from pyproj import Transformer
 from pyproj.exceptions import ProjError
 
 
-@lru_cache(maxsize=None)
+# Spanish ETRS89 / UTM zones 29N-31N, indexed by ``zone - 29``.
+_UTM_EPSG = np.array(["EPSG:25829", "EPSG:25830", "EPSG:25831"], dtype=object)
+_EPSG_BY_ZONE = dict(zip(range(29, 32), _UTM_EPSG))
+
+# Transformers keyed by (input_epsg, output_epsg), least recently used
+# evicted first.
+_TRANSFORMER_CACHE: OrderedDict[tuple[str, str], Transformer] = OrderedDict()
+_TRANSFORMER_CACHE_SIZE = 256
+
+# GRS80 ellipsoid and UTM parameters for the Krüger series below.
+_GRS80_A = 6378137.0
+_GRS80_F = 1 / 298.257222101
+_UTM_K0 = 0.9996
+_UTM_FALSE_EASTING = 500000.0
+
+_N = _GRS80_F / (2 - _GRS80_F)
+_E = np.sqrt(_GRS80_F * (2 - _GRS80_F))
+_K0A = _UTM_K0 * _GRS80_A / (1 + _N) * (
+    1 + _N**2 / 4 + _N**4 / 64 + _N**6 / 256
+)
+_ALPHA = (
+    _N / 2 - 2 * _N**2 / 3 + 5 * _N**3 / 16 + 41 * _N**4 / 180
+    - 127 * _N**5 / 288 + 7891 * _N**6 / 37800,
+    13 * _N**2 / 48 - 3 * _N**3 / 5 + 557 * _N**4 / 1440
+    + 281 * _N**5 / 630 - 1983433 * _N**6 / 1935360,
+    61 * _N**3 / 240 - 103 * _N**4 / 140 + 15061 * _N**5 / 26880
+    + 167603 * _N**6 / 181440,
+    49561 * _N**4 / 161280 - 179 * _N**5 / 168 + 6601661 * _N**6 / 7257600,
+    34729 * _N**5 / 80640 - 3418889 * _N**6 / 1995840,
+    212378941 * _N**6 / 319334400,
+)
+# PROJ's exact tmerc returns HUGE_VAL where |eta| exceeds this limit.
+_ETA_MAX = 2.623395162778
+
+
+def _build_transformer(input_epsg: str, output_epsg: str) -> Transformer:
+    """Create a lon/lat-ordered ``Transformer`` for the given CRS pair."""
+    return Transformer.from_crs(input_epsg, output_epsg, always_xy=True)
+
+
 def _get_transformer(input_epsg: str, output_epsg: str) -> Transformer:
     """Return a cached ``Transformer`` for the given CRS pair."""
-    return Transformer.from_crs(input_epsg, output_epsg, always_xy=True)
+    key = (input_epsg, output_epsg)
+    transformer = _TRANSFORMER_CACHE.get(key)
+    if transformer is not None:
+        try:
+            _TRANSFORMER_CACHE.move_to_end(key)
+        except KeyError:  # evicted by another thread meanwhile
+            pass
+        return transformer
+    if len(_TRANSFORMER_CACHE) >= _TRANSFORMER_CACHE_SIZE:
+        # Another thread may have evicted the same entry: pop, don't del.
+        _TRANSFORMER_CACHE.pop(next(iter(_TRANSFORMER_CACHE)), None)
+    transformer = _build_transformer(input_epsg, output_epsg)
+    _TRANSFORMER_CACHE[key] = transformer
+    return transformer
+
+
+def warm_transformers(input_epsg: str) -> None:
+    """Build the cached transformers to UTM 29N-31N ahead of a conversion.
+
+    EPSG:4258 input is projected without pyproj by default, so nothing is
+    built for it.
+    """
+    if input_epsg == "EPSG:4258":
+        return
+    for epsg in _EPSG_BY_ZONE.values():
+        _get_transformer(input_epsg, epsg)
+
+
+def _utm_forward_grs80(
+    lon_deg: np.ndarray, lat_deg: np.ndarray, zone: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Project ETRS89 lon/lat (degrees) to UTM ``zone`` north.
+
+    Vectorised 6th-order Krüger series, equivalent to PROJ's ``utm``
+    projection on GRS80 to well below a millimetre inside the zone. Points
+    outside PROJ's projection domain come back as ``inf``, as from PROJ.
+    """
+    # The poles and the domain edge go through arctanh(+-1); the infinities
+    # are expected and the affected rows are either exact or replaced below.
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        lam = np.deg2rad(lon_deg - (6.0 * zone - 183.0))
+        sin_phi = np.sin(np.deg2rad(lat_deg))
+        t = np.sinh(np.arctanh(sin_phi) - _E * np.arctanh(_E * sin_phi))
+        # Gauss-Schreiber coordinates as a complex number xi' + i*eta'.
+        zeta = np.arctan2(t, np.cos(lam)) + 1j * np.arctanh(
+            np.sin(lam) / np.hypot(1.0, t)
+        )
+        # Clenshaw summation of sum(alpha_j * sin(2 j zeta)).
+        two_cos = 2 * np.cos(2 * zeta)
+        b1 = np.zeros_like(zeta)
+        b2 = np.zeros_like(zeta)
+        for alpha in reversed(_ALPHA):
+            b1, b2 = alpha + two_cos * b1 - b2, b1
+        zeta += b1 * np.sin(2 * zeta)
+    x = _UTM_FALSE_EASTING + _K0A * zeta.imag
+    y = _K0A * zeta.real
+    # Written as a negation so that NaN (from eta' = +-inf) is outside too.
+    outside = ~(np.abs(zeta.imag) <= _ETA_MAX)
+    x[outside] = np.inf
+    y[outside] = np.inf
+    return x, y
+
+
+# Built on the first ``backend="numba"`` call: importing numba costs more
+# than the rest of this module, and the default path never needs it.
+_NUMBA_KERNEL = None
+
+
+def _numba_kernel():
+    """Return the compiled per-point UTM kernel, or ``None`` without numba."""
+    global _NUMBA_KERNEL
+    if _NUMBA_KERNEL is not None:
+        return _NUMBA_KERNEL
+    try:
+        from numba import njit, prange
+    except ImportError:  # numba is an optional accelerator
+        return None
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def kernel(lon_deg, lat_deg, zone, out_x, out_y):
+        """Compiled per-point version of :func:`_utm_forward_grs80`."""
+        lon0 = 6.0 * zone - 183.0
+        for i in prange(lon_deg.size):
+            lam = math.radians(lon_deg[i] - lon0)
+            sin_phi = math.sin(math.radians(lat_deg[i]))
+            # fastmath assumes finite values, so the poles (t = +-inf) and
+            # the domain test are handled without producing infinities.
+            if abs(sin_phi) >= 1.0:
+                xi = math.copysign(math.pi / 2, sin_phi)
+                sin_eta = 0.0
+            else:
+                t = math.sinh(math.atanh(sin_phi) - _E * math.atanh(_E * sin_phi))
+                xi = math.atan2(t, math.cos(lam))
+                sin_eta = math.sin(lam) / math.hypot(1.0, t)
+            out_x[i] = math.inf
+            out_y[i] = math.inf
+            if abs(sin_eta) < 1.0:
+                zeta = complex(xi, math.atanh(sin_eta))
+                two_cos = 2.0 * cmath.cos(2.0 * zeta)
+                b1 = 0j
+                b2 = 0j
+                for j in range(5, -1, -1):
+                    b1, b2 = _ALPHA[j] + two_cos * b1 - b2, b1
+                zeta += b1 * cmath.sin(2.0 * zeta)
+                if abs(zeta.imag) <= _ETA_MAX:
+                    out_x[i] = _UTM_FALSE_EASTING + _K0A * zeta.imag
+                    out_y[i] = _K0A * zeta.real
+
+    _NUMBA_KERNEL = kernel
+    return kernel
+
+
+def _utm_forward(
+    lon_deg: np.ndarray, lat_deg: np.ndarray, zone: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Project ETRS89 lon/lat to UTM, using the Numba kernel if installed."""
+    kernel = _numba_kernel()
+    if kernel is None:
+        return _utm_forward_grs80(lon_deg, lat_deg, zone)
+    x = np.empty_like(lon_deg, dtype=float)
+    y = np.empty_like(lat_deg, dtype=float)
+    kernel(lon_deg, lat_deg, zone, x, y)
+    return x, y
+
+
+def _project(
+    lon_deg: np.ndarray,
+    lat_deg: np.ndarray,
+    zone: int,
+    input_epsg: str,
+    backend: str | None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Project lon/lat in ``input_epsg`` to ETRS89 / UTM ``zone``."""
+    if backend == "pyproj" or (backend is None and input_epsg != "EPSG:4258"):
+        transformer = _get_transformer(input_epsg, _EPSG_BY_ZONE[zone])
+        return transformer.transform(lon_deg, lat_deg)
+    if backend == "numba":
+        return _utm_forward(lon_deg, lat_deg, zone)
+    return _utm_forward_grs80(lon_deg, lat_deg, zone)
 
 
 def convert_dataframe(
@@ -21,6 +201,8 @@ def convert_dataframe(
     use_decimal_comma: bool = False,
     input_epsg: str = "EPSG:4258",
     round_decimals: int = 3,
+    allow_empty: bool = False,
+    backend: str | None = None,
 ) -> tuple[pd.DataFrame, int, int]:
     """Convert a DataFrame of geographic coordinates to ETRS89/UTM.
 
@@ -44,6 +226,17 @@ def convert_dataframe(
         EPSG code of the input geographic coordinates.
     round_decimals:
         Number of decimal places to round the output coordinates (default 3).
+    allow_empty:
+        If ``True`` a DataFrame without valid rows, or whose rows all fail
+        to transform in ``"auto"`` mode, yields an empty result instead of
+        raising. Useful when converting a large input in chunks.
+    backend:
+        Projection engine. ``None`` (default) uses the built-in NumPy
+        Krüger series for EPSG:4258 input and pyproj otherwise.
+        ``"pyproj"``, ``"numpy"`` or ``"numba"`` force one engine; the last
+        two only accept EPSG:4258 input. The Numba kernel runs in parallel,
+        and its fallback threading layer (workqueue) must not be called
+        from several threads at once, so it is never picked implicitly.
 
     Returns
     -------
@@ -51,110 +244,109 @@ def convert_dataframe(
         converted_df: The converted DataFrame.
         n_valid: Number of valid rows.
         n_drop: Number of discarded rows.
+
+    When rows were dropped because their zone failed to transform, the
+    last PROJ error message is kept in ``converted_df.attrs["transform_error"]``.
     """
     if lat_col not in df.columns:
         raise ValueError(f"Column '{lat_col}' not found in DataFrame")
     if lon_col not in df.columns:
         raise ValueError(f"Column '{lon_col}' not found in DataFrame")
+    if backend not in (None, "pyproj", "numpy", "numba"):
+        raise ValueError(f"Unknown backend: {backend}")
+    if backend in ("numpy", "numba") and input_epsg != "EPSG:4258":
+        raise ValueError(f"backend '{backend}' requires input_epsg='EPSG:4258'")
+    if backend == "numba" and _numba_kernel() is None:
+        raise ImportError("backend 'numba' requires the numba package")
 
-    df2 = df.copy()
-
-    def to_float_series(series: pd.Series) -> pd.Series:
-        series = series.astype(str)
+    def to_float_array(series: pd.Series) -> np.ndarray:
+        if (
+            pd.api.types.is_numeric_dtype(series)
+            and not pd.api.types.is_bool_dtype(series)
+        ):
+            return series.to_numpy(dtype=float, na_value=np.nan)
+        values = series.astype(str).tolist()
         if use_decimal_comma:
-            series = series.str.replace(",", ".", regex=False)
-        return pd.to_numeric(series, errors="coerce")
+            values = [v.replace(",", ".") for v in values]
+        return np.asarray(pd.to_numeric(values, errors="coerce"), dtype=float)
 
-    lat_s = to_float_series(df2[lat_col])
-    lon_s = to_float_series(df2[lon_col])
-
-    valid = lat_s.between(-90, 90) & lon_s.between(-180, 180)
-    n_all = len(df2)
+    lat_a = to_float_array(df[lat_col])
+    lon_a = to_float_array(df[lon_col])
+    # NaN compares False, so unparseable values are rejected as well.
+    valid = (np.abs(lat_a) <= 90) & (np.abs(lon_a) <= 180)
+    n_all = len(df)
     n_valid = int(valid.sum())
     n_drop = n_all - n_valid
 
-    if n_valid == 0:
+    if n_valid == 0 and not allow_empty:
         raise ValueError(
             "No valid rows with latitudes/longitudes in range."
         )
 
-    df_out = df2.loc[valid].copy()
-    lat_v = lat_s[valid].values
-    lon_v = lon_s[valid].values
+    df_out = df.loc[valid]
+    lat_v = lat_a[valid]
+    lon_v = lon_a[valid]
 
+    transform_error: str | None = None
     if mode == "force_31n":
-        results = pd.DataFrame(index=df_out.index)
-        transformer = _get_transformer(input_epsg, "EPSG:25831")
-        x, y = transformer.transform(lon_v, lat_v)
-        results["X_ETRS89"] = x
-        results["Y_ETRS89"] = y
-        results["EPSG_destino"] = "EPSG:25831"
-        results["Huso"] = 31
+        x, y = _project(lon_v, lat_v, 31, input_epsg, backend)
+        zones = np.full(len(lon_v), 31, dtype=np.int8)
 
     elif mode == "auto":
-        zones = np.clip(((lon_v + 180.0) // 6.0).astype(int) + 1, 29, 31)
-        xs = np.full_like(lon_v, np.nan, dtype=float)
-        ys = np.full_like(lat_v, np.nan, dtype=float)
-        epsgs = np.empty(len(zones), dtype=object)
-        husos = zones.astype(int)
+        zones = np.clip(((lon_v + 180.0) // 6.0).astype(np.int8) + 1, 29, 31)
+        xs = np.empty_like(lon_v, dtype=float)
+        ys = np.empty_like(lat_v, dtype=float)
         failed = np.zeros(len(zones), dtype=bool)
         last_error: ProjError | None = None
         for zone in np.unique(zones):
-            epsg = f"EPSG:258{int(zone):02d}"
             mask = zones == zone
             try:
-                transformer = _get_transformer(input_epsg, epsg)
-                x, y = transformer.transform(lon_v[mask], lat_v[mask])
+                x, y = _project(
+                    lon_v[mask], lat_v[mask], int(zone), input_epsg, backend
+                )
             except ProjError as exc:  # pragma: no cover - handled in tests
                 failed[mask] = True
                 last_error = exc
                 continue
             xs[mask] = x
             ys[mask] = y
-            epsgs[mask] = epsg
         if failed.any():
             n_fail = int(failed.sum())
-            df_out = df_out.loc[~failed].copy()
+            df_out = df_out.loc[~failed]
             xs = xs[~failed]
             ys = ys[~failed]
-            epsgs = epsgs[~failed]
-            husos = husos[~failed]
+            zones = zones[~failed]
             n_valid -= n_fail
             n_drop += n_fail
-            if n_valid == 0:
+            transform_error = str(last_error)
+            if n_valid == 0 and not allow_empty:
                 raise ValueError(
                     f"Coordinate transformation failed for all rows: {last_error}"
                 )
-        results = pd.DataFrame(index=df_out.index)
-        results["X_ETRS89"] = xs
-        results["Y_ETRS89"] = ys
-        results["EPSG_destino"] = epsgs
-        results["Huso"] = husos
+        x, y = xs, ys
 
     elif mode == "fixed":
-        results = pd.DataFrame(index=df_out.index)
         if fixed_zone is None:
             raise ValueError("fixed_zone must be provided when mode='fixed'")
         if fixed_zone not in (29, 30, 31):
             raise ValueError("fixed_zone must be one of 29, 30, or 31")
-        epsg = f"EPSG:258{int(fixed_zone):02d}"
-        transformer = _get_transformer(input_epsg, epsg)
-        x, y = transformer.transform(lon_v, lat_v)
-        results["X_ETRS89"] = x
-        results["Y_ETRS89"] = y
-        results["EPSG_destino"] = epsg
-        results["Huso"] = int(fixed_zone)
+        x, y = _project(lon_v, lat_v, int(fixed_zone), input_epsg, backend)
+        zones = np.full(len(lon_v), fixed_zone, dtype=np.int8)
 
     else:
         raise ValueError(f"Unknown mode: {mode}")
 
-    results["X_ETRS89"] = results["X_ETRS89"].round(round_decimals)
-    results["Y_ETRS89"] = results["Y_ETRS89"].round(round_decimals)
+    # The projected arrays are ours, so round them without another buffer.
+    np.round(x, round_decimals, out=x)
+    np.round(y, round_decimals, out=y)
 
-    out = pd.concat(
-        [df_out.reset_index(drop=True), results.reset_index(drop=True)],
-        axis=1,
-    )
+    out = df_out.reset_index(drop=True)
+    out["X_ETRS89"] = x
+    out["Y_ETRS89"] = y
+    out["EPSG_destino"] = pd.Categorical.from_codes(zones - 29, categories=_UTM_EPSG)
+    out["Huso"] = zones
+    if transform_error is not None:
+        out.attrs["transform_error"] = transform_error
 
     return out, n_valid, n_drop
 
@@ -0,0 +1,24 @@
+import io
+
+import pandas as pd
+
+
+def read_upload(
+    data: bytes, is_csv: bool, sep: str | None = None, encoding: str | None = None
+) -> pd.DataFrame:
+    """Read an uploaded CSV or Excel file into a DataFrame.
+
+    CSV files use pandas' C engine, or the python engine when ``sep`` is
+    ``None`` so the separator can be sniffed. Both leave dates, times and
+    decimal-comma text as strings, so writing the frame back with
+    ``to_csv`` reproduces those columns. Excel files use the calamine
+    engine when installed and openpyxl otherwise.
+    """
+    if is_csv:
+        if sep is None:
+            return pd.read_csv(io.BytesIO(data), sep=None, engine="python", encoding=encoding)
+        return pd.read_csv(io.BytesIO(data), sep=sep, encoding=encoding)
+    try:
+        return pd.read_excel(io.BytesIO(data), engine="calamine")
+    except ImportError:
+        return pd.read_excel(io.BytesIO(data))  # requires openpyxl
@@ -0,0 +1,9 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture(scope="session")
+def single_madrid_df():
+    # Shared across tests: convert_dataframe never mutates its input.
+    return pd.DataFrame({"Lat": np.array([40.0]), "Lon": np.array([-3.0])})
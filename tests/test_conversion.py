@@ -1,37 +1,67 @@
+import numpy as np
 import pandas as pd
 import pytest
 from pyproj import Transformer
 from pyproj.exceptions import ProjError
 
-from etrs89_converter.converter import _get_transformer, convert_dataframe
+from etrs89_converter import converter, read_upload
+from etrs89_converter.converter import (
+    _EPSG_BY_ZONE,
+    _utm_forward,
+    _utm_forward_grs80,
+    convert_dataframe,
+    warm_transformers,
+)
+
 
+@pytest.fixture(scope="module")
+def expected_transformers():
+    # Reference transformers, built once for the whole module on first use.
+    return {
+        zone: Transformer.from_crs("EPSG:4258", epsg, always_xy=True)
+        for zone, epsg in _EPSG_BY_ZONE.items()
+    }
 
-@pytest.fixture(autouse=True)
+
+@pytest.fixture
 def clear_transformer_cache():
-    _get_transformer.cache_clear()
+    converter._TRANSFORMER_CACHE.clear()
+    yield
+    converter._TRANSFORMER_CACHE.clear()
 
 
-def _expected_coords(zones, lons, lats):
-    coords = []
-    for zone, lon, lat in zip(zones, lons, lats):
-        transformer = Transformer.from_crs(
-            "EPSG:4258", f"EPSG:258{zone:02d}", always_xy=True
-        )
-        coords.append(transformer.transform(lon, lat))
-    return coords
+def _latlon_df(lats, lons):
+    return pd.DataFrame(
+        {
+            "Lat": np.asarray(lats, dtype=np.float64),
+            "Lon": np.asarray(lons, dtype=np.float64),
+        }
+    )
+
+
+def _expected_coords(transformers, zones, lons, lats):
+    zones = np.asarray(zones)
+    lons = np.asarray(lons, dtype=float)
+    lats = np.asarray(lats, dtype=float)
+    xs = np.empty_like(lons)
+    ys = np.empty_like(lats)
+    for zone in np.unique(zones):
+        mask = zones == zone
+        transformer = transformers[zone]
+        xs[mask], ys[mask] = transformer.transform(lons[mask], lats[mask])
+    return xs, ys
 
 
 def test_forzar_31n_sample():
-    df = pd.DataFrame({"Lat": [41.84346], "Lon": [1.03335]})
+    df = _latlon_df([41.84346], [1.03335])
     out, n_valid, n_drop = convert_dataframe(
         df, "Lat", "Lon", mode="force_31n"
     )
     assert n_valid == 1
     assert n_drop == 0
-    row = out.loc[0]
-    assert row["Huso"] == 31
-    assert row["X_ETRS89"] == pytest.approx(336724.563, abs=0.001)
-    assert row["Y_ETRS89"] == pytest.approx(4634265.720, abs=0.001)
+    assert out["Huso"].iat[0] == 31
+    assert out["X_ETRS89"].iat[0] == pytest.approx(336724.563, abs=0.001)
+    assert out["Y_ETRS89"].iat[0] == pytest.approx(4634265.720, abs=0.001)
 
 
 def test_decimal_comma_true():
@@ -39,10 +69,9 @@ def test_decimal_comma_true():
     out, _, _ = convert_dataframe(
         df, "Lat", "Lon", mode="force_31n", use_decimal_comma=True
     )
-    row = out.loc[0]
-    assert row["Huso"] == 31
-    assert row["X_ETRS89"] == pytest.approx(336724.563, abs=0.001)
-    assert row["Y_ETRS89"] == pytest.approx(4634265.720, abs=0.001)
+    assert out["Huso"].iat[0] == 31
+    assert out["X_ETRS89"].iat[0] == pytest.approx(336724.563, abs=0.001)
+    assert out["Y_ETRS89"].iat[0] == pytest.approx(4634265.720, abs=0.001)
 
 
 def test_decimal_comma_false_raises():
@@ -52,19 +81,17 @@ def test_decimal_comma_false_raises():
 
 
 def test_round_decimals_changes_precision():
-    df = pd.DataFrame({"Lat": [41.84346], "Lon": [1.03335]})
+    df = _latlon_df([41.84346], [1.03335])
     out2, _, _ = convert_dataframe(
         df, "Lat", "Lon", mode="force_31n", round_decimals=2
     )
     out4, _, _ = convert_dataframe(
         df, "Lat", "Lon", mode="force_31n", round_decimals=4
     )
-    row2 = out2.loc[0]
-    row4 = out4.loc[0]
-    assert row2["X_ETRS89"] == 336724.56
-    assert row2["Y_ETRS89"] == 4634265.72
-    assert row4["X_ETRS89"] == 336724.5628
-    assert row4["Y_ETRS89"] == 4634265.7204
+    assert out2["X_ETRS89"].iat[0] == 336724.56
+    assert out2["Y_ETRS89"].iat[0] == 4634265.72
+    assert out4["X_ETRS89"].iat[0] == 336724.5628
+    assert out4["Y_ETRS89"].iat[0] == 4634265.7204
 
 
 @pytest.mark.parametrize(
@@ -80,106 +107,166 @@ def test_missing_columns_raise(cols, missing):
         convert_dataframe(df, "Lat", "Lon", mode="force_31n")
 
 
-def test_auto_multiple_zones():
-    df = pd.DataFrame(
-        {"Lat": [43.0, 40.0, 41.5], "Lon": [-8.0, -3.0, 1.5]}
-    )
-    out, n_valid, n_drop = convert_dataframe(df, "Lat", "Lon", mode="auto")
-    assert n_valid == 3
-    assert n_drop == 0
-    assert out["EPSG_destino"].tolist() == [
-        "EPSG:25829",
-        "EPSG:25830",
-        "EPSG:25831",
-    ]
-    expected = _expected_coords([29, 30, 31], df["Lon"], df["Lat"])
-    for idx, (x, y) in enumerate(expected):
-        assert out.loc[idx, "X_ETRS89"] == pytest.approx(x, abs=0.001)
-        assert out.loc[idx, "Y_ETRS89"] == pytest.approx(y, abs=0.001)
+_AUTO_CASES = {
+    "multiple_zones": ([43.0, 40.0, 41.5], [-8.0, -3.0, 1.5], [29, 30, 31]),
+    "zone_boundaries": ([40.0, 40.0, 40.0], [-12.0, -6.0, 0.0], [29, 30, 31]),
+    "clamped_longitudes": ([40.0, 40.0], [-25.0, 9.0], [29, 31]),
+}
 
 
-def test_auto_zone_boundaries():
-    df = pd.DataFrame({"Lat": [40.0, 40.0, 40.0], "Lon": [-12.0, -6.0, 0.0]})
-    out, n_valid, n_drop = convert_dataframe(df, "Lat", "Lon", mode="auto")
-    assert n_valid == 3
-    assert n_drop == 0
-    assert out["Huso"].tolist() == [29, 30, 31]
-    assert out["EPSG_destino"].tolist() == [
-        "EPSG:25829",
-        "EPSG:25830",
-        "EPSG:25831",
-    ]
-    expected = _expected_coords([29, 30, 31], df["Lon"], df["Lat"])
-    for idx, (x, y) in enumerate(expected):
-        assert out.loc[idx, "X_ETRS89"] == pytest.approx(x, abs=0.001)
-        assert out.loc[idx, "Y_ETRS89"] == pytest.approx(y, abs=0.001)
+@pytest.fixture(scope="module", params=["pyproj", "numpy", "numba"])
+def backend(request):
+    if request.param == "numba":
+        pytest.importorskip("numba")
+    return request.param
 
 
-def test_auto_clamps_longitudes():
-    df = pd.DataFrame({"Lat": [40.0, 40.0], "Lon": [-25.0, 9.0]})
-    out, n_valid, n_drop = convert_dataframe(df, "Lat", "Lon", mode="auto")
-    assert n_valid == 2
+@pytest.fixture(scope="module")
+def auto_expected(expected_transformers):
+    return {
+        case: _expected_coords(expected_transformers, zones, lons, lats)
+        for case, (lats, lons, zones) in _AUTO_CASES.items()
+    }
+
+
+@pytest.fixture(scope="module", params=list(_AUTO_CASES))
+def auto_case(request, backend, auto_expected):
+    lats, lons, zones = _AUTO_CASES[request.param]
+    df = _latlon_df(lats, lons)
+    out = convert_dataframe(df, "Lat", "Lon", mode="auto", backend=backend)
+    return zones, auto_expected[request.param], out
+
+
+@pytest.mark.proj
+def test_auto_zone_selection(auto_case):
+    zones, _, (out, n_valid, n_drop) = auto_case
+    assert n_valid == len(zones)
     assert n_drop == 0
-    assert out["Huso"].tolist() == [29, 31]
-    assert out["EPSG_destino"].tolist() == [
-        "EPSG:25829",
-        "EPSG:25831",
-    ]
-    expected = _expected_coords([29, 31], df["Lon"], df["Lat"])
-    for idx, (x, y) in enumerate(expected):
-        assert out.loc[idx, "X_ETRS89"] == pytest.approx(x, abs=0.001)
-        assert out.loc[idx, "Y_ETRS89"] == pytest.approx(y, abs=0.001)
+    np.testing.assert_array_equal(out["Huso"].to_numpy(), zones)
+    assert out["EPSG_destino"].tolist() == [_EPSG_BY_ZONE[z] for z in zones]
 
 
-def test_fixed_mode_coordinates():
-    df = pd.DataFrame({"Lat": [40.0], "Lon": [-3.0]})
+@pytest.mark.proj
+def test_auto_coordinates(auto_case):
+    _, (exp_x, exp_y), (out, _, _) = auto_case
+    np.testing.assert_allclose(out["X_ETRS89"].to_numpy(), exp_x, rtol=0, atol=1e-3)
+    np.testing.assert_allclose(out["Y_ETRS89"].to_numpy(), exp_y, rtol=0, atol=1e-3)
+
+
+@pytest.mark.proj
+def test_fixed_mode_coordinates(single_madrid_df, backend, expected_transformers):
     out, n_valid, n_drop = convert_dataframe(
-        df, "Lat", "Lon", mode="fixed", fixed_zone=30
+        single_madrid_df, "Lat", "Lon", mode="fixed", fixed_zone=30, backend=backend
     )
     assert n_valid == 1
     assert n_drop == 0
-    row = out.loc[0]
-    assert row["Huso"] == 30
-    transformer = Transformer.from_crs(
-        "EPSG:4258", "EPSG:25830", always_xy=True
-    )
-    x, y = transformer.transform(-3.0, 40.0)
-    assert row["X_ETRS89"] == pytest.approx(x, abs=0.001)
-    assert row["Y_ETRS89"] == pytest.approx(y, abs=0.001)
-    assert row["EPSG_destino"] == "EPSG:25830"
+    assert out["Huso"].iat[0] == 30
+    x, y = expected_transformers[30].transform(-3.0, 40.0)
+    assert out["X_ETRS89"].iat[0] == pytest.approx(x, abs=0.001)
+    assert out["Y_ETRS89"].iat[0] == pytest.approx(y, abs=0.001)
+    assert out["EPSG_destino"].iat[0] == "EPSG:25830"
+
+
+@pytest.mark.proj
+@pytest.mark.parametrize("zone", [29, 30, 31])
+def test_utm_forward_grs80_matches_pyproj(zone, expected_transformers):
+    lon, lat = np.meshgrid(np.linspace(-19.0, 5.0, 25), np.linspace(27.0, 44.0, 18))
+    lon, lat = lon.ravel(), lat.ravel()
+    x_exp, y_exp = expected_transformers[zone].transform(lon, lat)
+    x, y = _utm_forward_grs80(lon, lat, zone)
+    np.testing.assert_allclose(x, x_exp, rtol=0, atol=1e-6)
+    np.testing.assert_allclose(y, y_exp, rtol=0, atol=1e-6)
+
+
+@pytest.mark.proj
+@pytest.mark.filterwarnings("error::RuntimeWarning")
+@pytest.mark.parametrize("kernel", ["numpy", "numba"])
+def test_utm_forward_outside_domain_and_poles(kernel, expected_transformers):
+    if kernel == "numba":
+        pytest.importorskip("numba")
+    project = _utm_forward if kernel == "numba" else _utm_forward_grs80
+    # Far from the central meridian PROJ returns inf; the poles are finite.
+    lon = np.array([-87.0, -84.0, 90.0, -93.0, -3.0, -3.0, 10.0])
+    lat = np.array([0.0, 0.0, 0.0, 0.0, 90.0, -90.0, 90.0])
+    x, y = project(lon, lat, 30)
+    x_exp, y_exp = expected_transformers[30].transform(lon, lat)
+    np.testing.assert_allclose(x, x_exp, rtol=0, atol=1e-6)
+    np.testing.assert_allclose(y, y_exp, rtol=0, atol=1e-6)
+
+
+def test_utm_forward_numba_matches_numpy():
+    pytest.importorskip("numba")
+    lon = np.linspace(-9.5, 4.5, 50)
+    lat = np.linspace(35.5, 43.9, 50)
+    x, y = _utm_forward(lon, lat, 30)
+    x_exp, y_exp = _utm_forward_grs80(lon, lat, 30)
+    np.testing.assert_allclose(x, x_exp, rtol=0, atol=1e-6)
+    np.testing.assert_allclose(y, y_exp, rtol=0, atol=1e-6)
+
+
+def test_default_backend_does_not_use_numba(monkeypatch, single_madrid_df):
+    def fail(*args):
+        raise AssertionError("numba kernel used without backend='numba'")
+
+    monkeypatch.setattr(converter, "_numba_kernel", fail)
+    out, _, _ = convert_dataframe(single_madrid_df, "Lat", "Lon", mode="auto")
+    assert out["Huso"].iat[0] == 30
+
+
+@pytest.mark.parametrize(
+    "backend,input_epsg",
+    [("proj", "EPSG:4258"), ("numpy", "EPSG:4326"), ("numba", "EPSG:4326")],
+)
+def test_invalid_backend_raises(single_madrid_df, backend, input_epsg):
+    with pytest.raises(ValueError, match="backend"):
+        convert_dataframe(
+            single_madrid_df,
+            "Lat",
+            "Lon",
+            mode="force_31n",
+            input_epsg=input_epsg,
+            backend=backend,
+        )
 
 
-def test_fixed_mode_requires_zone():
-    df = pd.DataFrame({"Lat": [40.0], "Lon": [-3.0]})
+def test_fixed_mode_requires_zone(single_madrid_df):
     with pytest.raises(ValueError):
-        convert_dataframe(df, "Lat", "Lon", mode="fixed")
+        convert_dataframe(single_madrid_df, "Lat", "Lon", mode="fixed")
 
 
 @pytest.mark.parametrize("zone", [28, 32])
-def test_fixed_mode_zone_out_of_range_raises(zone):
-    df = pd.DataFrame({"Lat": [40.0], "Lon": [-3.0]})
+def test_fixed_mode_zone_out_of_range_raises(zone, single_madrid_df):
     with pytest.raises(ValueError, match="29, 30, or 31"):
-        convert_dataframe(df, "Lat", "Lon", mode="fixed", fixed_zone=zone)
-
-
-def test_auto_projerror_drops_rows(monkeypatch):
-    df = pd.DataFrame({"Lat": [43.0, 40.0, 41.5], "Lon": [-8.0, -3.0, 1.5]})
-    original_from_crs = Transformer.from_crs
+        convert_dataframe(single_madrid_df, "Lat", "Lon", mode="fixed", fixed_zone=zone)
+
+
+@pytest.mark.proj
+def test_auto_projerror_drops_rows(monkeypatch, clear_transformer_cache):
+    # ETRS89 input is projected without PROJ; use WGS84 to exercise pyproj.
+    df = _latlon_df([43.0, 40.0, 41.5], [-8.0, -3.0, 1.5])
+    for epsg in ("EPSG:25829", "EPSG:25831"):
+        monkeypatch.setitem(
+            converter._TRANSFORMER_CACHE,
+            ("EPSG:4326", epsg),
+            converter._build_transformer("EPSG:4326", epsg),
+        )
 
-    def failing_from_crs(src, dest, always_xy=True):
-        if dest == "EPSG:25830":
-            raise ProjError("failure for zone 30")
-        return original_from_crs(src, dest, always_xy=always_xy)
+    def failing_build(input_epsg, output_epsg):
+        # Zones 29 and 31 are served from the cache; only zone 30 is built.
+        raise ProjError(f"failure for {output_epsg}")
 
-    monkeypatch.setattr(Transformer, "from_crs", staticmethod(failing_from_crs))
-    out, n_valid, n_drop = convert_dataframe(df, "Lat", "Lon", mode="auto")
+    monkeypatch.setattr(converter, "_build_transformer", failing_build)
+    out, n_valid, n_drop = convert_dataframe(
+        df, "Lat", "Lon", mode="auto", input_epsg="EPSG:4326"
+    )
     assert n_valid == 2
     assert n_drop == 1
     assert out["Huso"].tolist() == [29, 31]
 
 
-def test_auto_projerror_all_rows_raise():
-    df = pd.DataFrame({"Lat": [43.0], "Lon": [-8.0]})
+@pytest.mark.proj
+def test_auto_projerror_all_rows_raise(clear_transformer_cache):
+    df = _latlon_df([43.0], [-8.0])
     with pytest.raises(ValueError, match="Coordinate transformation failed"):
         convert_dataframe(
             df,
@@ -190,20 +277,90 @@ def test_auto_projerror_all_rows_raise():
         )
 
 
-def test_invalid_lat_lon_rows_dropped():
-    df = pd.DataFrame(
-        {
-            "Lat": [41.84346, 100.0, 41.0],
-            "Lon": [1.03335, -3.0, 200.0],
-        }
+@pytest.mark.proj
+def test_auto_projerror_all_rows_allow_empty(clear_transformer_cache):
+    df = _latlon_df([43.0], [-8.0])
+    out, n_valid, n_drop = convert_dataframe(
+        df,
+        "Lat",
+        "Lon",
+        mode="auto",
+        input_epsg="EPSG:999999",
+        allow_empty=True,
     )
+    assert n_valid == 0
+    assert n_drop == 1
+    assert out.empty
+    assert out.attrs["transform_error"]
+
+
+@pytest.mark.proj
+def test_warm_transformers_only_for_pyproj_input(clear_transformer_cache):
+    warm_transformers("EPSG:4258")
+    assert converter._TRANSFORMER_CACHE == {}
+    warm_transformers("EPSG:4326")
+    assert set(converter._TRANSFORMER_CACHE) == {
+        ("EPSG:4326", epsg) for epsg in _EPSG_BY_ZONE.values()
+    }
+
+
+def test_transformer_cache_evicts_least_recently_used(
+    monkeypatch, clear_transformer_cache
+):
+    monkeypatch.setattr(converter, "_TRANSFORMER_CACHE_SIZE", 2)
+    monkeypatch.setattr(converter, "_build_transformer", lambda src, dst: object())
+    first = converter._get_transformer("EPSG:4326", "EPSG:25829")
+    converter._get_transformer("EPSG:4326", "EPSG:25830")
+    assert converter._get_transformer("EPSG:4326", "EPSG:25829") is first
+    converter._get_transformer("EPSG:4326", "EPSG:25831")
+    assert list(converter._TRANSFORMER_CACHE) == [
+        ("EPSG:4326", "EPSG:25829"),
+        ("EPSG:4326", "EPSG:25831"),
+    ]
+
+
+def test_invalid_lat_lon_rows_dropped():
+    df = _latlon_df([41.84346, 100.0, 41.0], [1.03335, -3.0, 200.0])
     out, n_valid, n_drop = convert_dataframe(df, "Lat", "Lon", mode="force_31n")
     assert n_valid == 1
     assert n_drop == 2
     assert len(out) == 1
-    row = out.loc[0]
-    assert row["Huso"] == 31
-    assert row["X_ETRS89"] == pytest.approx(336724.563, abs=0.001)
-    assert row["Y_ETRS89"] == pytest.approx(4634265.720, abs=0.001)
+    assert out["Huso"].iat[0] == 31
+    assert out["X_ETRS89"].iat[0] == pytest.approx(336724.563, abs=0.001)
+    assert out["Y_ETRS89"].iat[0] == pytest.approx(4634265.720, abs=0.001)
+
+
+def test_bool_coordinates_are_invalid():
+    df = pd.DataFrame({"Lat": np.array([True, False]), "Lon": np.array([1.0, 1.0])})
+    with pytest.raises(ValueError, match="No valid rows"):
+        convert_dataframe(df, "Lat", "Lon", mode="force_31n")
 
 
+def test_allow_empty_returns_empty_result():
+    df = _latlon_df([100.0], [-3.0])
+    out, n_valid, n_drop = convert_dataframe(
+        df, "Lat", "Lon", mode="force_31n", allow_empty=True
+    )
+    assert n_valid == 0
+    assert n_drop == 1
+    assert out.empty
+    assert "transform_error" not in out.attrs
+    assert list(out.columns) == [
+        "Lat",
+        "Lon",
+        "X_ETRS89",
+        "Y_ETRS89",
+        "EPSG_destino",
+        "Huso",
+    ]
+
+
+@pytest.mark.parametrize("sep", [None, ";"])
+def test_read_upload_round_trips_dates_and_times(sep):
+    text = (
+        "Lat;Lon;fecha;hora;importe\n"
+        "41.84346;1.03335;2024-01-05;11:00;1,5\n"
+        "40.4168;-3.7038;2024-12-31;23:59:59;2\n"
+    )
+    df = read_upload(text.encode("utf-8"), is_csv=True, sep=sep, encoding="utf-8")
+    assert df.to_csv(index=False, sep=";") == text